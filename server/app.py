@@ -1,23 +1,253 @@
-from flask import Flask, request, jsonify
+import os
+
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context, url_for
 from config import Config
 from flask_cors import CORS
 
-app = Flask(__name__)
+import digest
+from executor import ExecutorSaturated
+from extract import extract_text
+from metrics import Metrics
+from services import Services
+from streaming import iter_text_chunks, stream_digest
+from validation import (
+    InvalidRequest,
+    parse_digest_request,
+    parse_positive_int,
+    parse_query_ints,
+    parse_text,
+    parse_text_format,
+    parse_texts,
+    parse_urls,
+    validate_job,
+)
+
+bp = Blueprint("digest", __name__)
+
+
+def get_services():
+    return current_app.extensions["blog_digest"]
+
+
+def get_job_queue():
+    # Only the jobs endpoints need the queue; nothing else should build or start it.
+    return get_services().start_jobs()
+
+
+def read_json(optional=False):
+    """The request's JSON object; with `optional`, an empty body reads as `{}`."""
+    if optional and not request.get_data(cache=True):
+        return {}
+    with get_services().metrics.stage("parse"):
+        data = request.get_json(force=True, silent=True)
+    if data is None:
+        raise InvalidRequest("request body must be valid JSON")
+    if not isinstance(data, dict):
+        raise InvalidRequest("request body must be a JSON object")
+    return data
+
+
+@bp.app_errorhandler(InvalidRequest)
+def handle_invalid_request(exc):
+    return jsonify(error=str(exc)), 400
 
-app.config.from_object(Config)
 
-CORS(app, resources={r"/*": {"origins": app.config.get("FRONTEND_URL", "*")}})
+@bp.app_errorhandler(ExecutorSaturated)
+def handle_saturated(exc):
+    response = jsonify(error="server is busy, retry later")
+    response.status_code = 429
+    response.headers["Retry-After"] = str(current_app.config["EXECUTOR_RETRY_AFTER"])
+    return response
 
-@app.route('/')
+
+@bp.route('/')
 def hello_world():
     return 'Hello, World!'
 
-@app.route("/process", methods=["POST"])
+@bp.route("/process", methods=["POST"])
 def process_text():
-    data = request.get_json()
-    user_text = data.get("text", "")
-    processed_text = user_text.upper()
-    return jsonify(result=processed_text)
+    data = read_json()
+    user_text = parse_text(data)
+    operations, options, content_type = parse_digest_request(data)
+    services = get_services()
+    result = services.run_digest(services.extract_texts([user_text], content_type), operations, options)[0]
+    return jsonify(result=result)
+
+@bp.route("/process/batch", methods=["POST"])
+def process_batch():
+    data = read_json()
+    texts = parse_texts(data, current_app.config["MAX_BATCH_SIZE"])
+    operations, options, content_type = parse_digest_request(data)
+    services = get_services()
+    results = services.run_digest(services.extract_texts(texts, content_type), operations, options)
+    return jsonify(results=results)
+
+@bp.route("/process/links", methods=["POST"])
+def process_links():
+    data = read_json()
+    urls = parse_urls(data, current_app.config["FETCH_MAX_URLS"])
+    operations, options, _ = parse_digest_request(data)
+
+    services = get_services()
+    with services.metrics.stage("fetch"):
+        fetched = services.fetcher.fetch_many(urls)
+    ok = [page for page in fetched if "error" not in page]
+    with services.metrics.stage("extract"):
+        texts = [extract_text(page["text"], page["content_type"]) for page in ok]
+    digests = iter(services.run_digest(texts, operations, options))
+
+    results = []
+    for page in fetched:
+        if "error" in page:
+            results.append({"url": page["url"], "error": page["error"]})
+        else:
+            results.append({"url": page["url"], "status": page["status"], "result": next(digests)})
+    return jsonify(results=results)
+
+@bp.route("/process/stream", methods=["POST"])
+def process_stream():
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "sse"):
+        raise InvalidRequest("format must be ndjson or sse")
+    options = parse_query_ints(request.args, ("num_sentences", "num_keywords"))
+
+    config = current_app.config
+    chunks = iter_text_chunks(
+        request.stream,
+        min_chunk=config["STREAM_MIN_CHUNK"],
+        max_chunk=config["STREAM_MAX_CHUNK"],
+    )
+    events = stream_digest(chunks, fmt, max_terms=config["STREAM_MAX_TERMS"], **options)
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(
+        stream_with_context(events),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@bp.route("/corpus/documents", methods=["POST"])
+def add_corpus_documents():
+    data = read_json()
+    texts = parse_texts(data, current_app.config["MAX_BATCH_SIZE"])
+    content_type = parse_text_format(data)
+    services = get_services()
+    documents = services.corpus.add(services.extract_texts(texts, content_type))
+    return jsonify(documents=documents)
+
+@bp.route("/corpus/query", methods=["POST"])
+def query_corpus():
+    data = read_json()
+    text = parse_text(data)
+    content_type = parse_text_format(data)
+    limits = {
+        name: parse_positive_int(name, data.get(name, digest.DEFAULT_OPTIONS[name]))
+        for name in ("num_topics", "num_keywords")
+    }
+    services = get_services()
+    text = services.extract_texts([text], content_type)[0]
+    with services.metrics.stage("corpus_query"):
+        return jsonify(result=services.corpus.query(text, **limits))
+
+@bp.route("/corpus/stats")
+def corpus_stats():
+    return jsonify(get_services().corpus.info())
+
+@bp.route("/jobs", methods=["POST"])
+def create_job():
+    payload = read_json()
+    kind = payload.pop("kind", None)
+    validate_job(kind, payload, current_app.config["MAX_BATCH_SIZE"])
+    job_queue = get_job_queue()
+    job_id, created = job_queue.submit(kind, payload)
+    job = job_queue.get(job_id)
+    response = jsonify(id=job_id, status=job["status"], duplicate=not created)
+    response.status_code = 202
+    response.headers["Location"] = url_for(".get_job", job_id=job_id)
+    return response
+
+@bp.route("/jobs/<job_id>")
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify(error="job not found"), 404
+    if job.pop("has_artifact"):
+        job["artifact_url"] = url_for(".get_job_artifact", job_id=job_id)
+    return jsonify(job)
+
+@bp.route("/jobs/<job_id>/artifact")
+def get_job_artifact(job_id):
+    artifact = get_job_queue().artifact(job_id)
+    if artifact is None:
+        return jsonify(error="job has no artifact"), 404
+    body, mimetype = artifact
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=blog-digest-{job_id}.pdf",
+    })
+
+@bp.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job_queue = get_job_queue()
+    if job_queue.get(job_id) is None:
+        return jsonify(error="job not found"), 404
+    if not job_queue.cancel(job_id):
+        return jsonify(error="job already finished"), 409
+    return jsonify(id=job_id, status="cancelled")
+
+@bp.route("/cache/stats")
+def cache_stats():
+    return jsonify(get_services().cache.info())
+
+
+def warm_up():
+    stages = read_json(optional=True).get("stages")
+    if stages is not None and (not isinstance(stages, list) or not all(isinstance(s, str) for s in stages)):
+        raise InvalidRequest("stages must be a list of strings")
+    try:
+        timings = get_services().warm_up(stages)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(stages={stage: round(seconds * 1000, 2) for stage, seconds in timings.items()})
+
+
+def create_app(config_object=Config):
+    app = Flask(__name__)
+
+    app.config.from_object(config_object)
+
+    CORS(app, resources={r"/*": {"origins": app.config.get("FRONTEND_URL", "*")}})
+
+    metrics = Metrics.from_config(app.config)
+    metrics.init_app(app)
+    services = Services(app.config, metrics)
+    app.extensions["blog_digest"] = services
+
+    # Only report the cache once this process has built it; a scrape must not create it.
+    def cache_lookups():
+        cache = services.built("cache")
+        if cache is None:
+            return []
+        return [({"outcome": outcome}, cache.stats[key]) for outcome, key in (
+            ("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses"),
+        )]
+
+    def cache_entries():
+        cache = services.built("cache")
+        return [] if cache is None else [({}, len(cache.memory))]
+
+    metrics.add_callback("cache_lookups_total", "Digest cache lookups by outcome.", "counter", cache_lookups)
+    metrics.add_callback("cache_entries", "Entries in the in-memory digest cache.", "gauge", cache_entries)
+
+    app.register_blueprint(bp)
+    if app.config["WARMUP_ENDPOINT"]:
+        app.add_url_rule("/warmup", "warmup", warm_up, methods=["POST"])
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    # With the debug reloader this script runs twice: in a watcher process that
+    # never serves a request, and in the child (WERKZEUG_RUN_MAIN set) that does.
+    # Only the serving process should start pools and pick up background jobs.
+    if not app.config["DEBUG"] or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        app.extensions["blog_digest"].start_worker()
+    app.run(debug=app.config["DEBUG"])
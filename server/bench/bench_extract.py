@@ -0,0 +1,78 @@
+"""Benchmark the article extractor over the saved pages in bench/corpus.
+
+    python bench/bench_extract.py [--repeat N]
+
+Reports throughput (pages/sec) and peak traced memory per page, and checks each
+page's output against the expectations in corpus/manifest.json. Exits non-zero
+if any expectation fails.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from extract import extract_article  # noqa: E402
+
+CORPUS = os.path.join(HERE, "corpus")
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS, "manifest.json"), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    pages = []
+    for entry in manifest:
+        with open(os.path.join(CORPUS, entry["file"]), encoding="utf-8") as fh:
+            pages.append((entry, fh.read()))
+    return pages
+
+
+def check(entry, text):
+    failures = [f"missing {phrase!r}" for phrase in entry.get("must_contain", []) if phrase not in text]
+    failures += [f"kept {phrase!r}" for phrase in entry.get("must_not_contain", []) if phrase in text]
+    return failures
+
+
+def peak_memory(html):
+    tracemalloc.start()
+    try:
+        extract_article(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="extractions per page for timing")
+    args = parser.parse_args()
+
+    pages = load_corpus()
+    failed = False
+    total_time = 0.0
+    print(f"{'page':<22}{'KiB':>8}{'pages/s':>10}{'peak KiB':>10}  check")
+    for entry, html in pages:
+        failures = check(entry, extract_article(html))
+        failed = failed or bool(failures)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            extract_article(html)
+        elapsed = time.perf_counter() - start
+        total_time += elapsed
+
+        print(
+            f"{entry['file']:<22}{len(html.encode()) / 1024:>8.1f}{args.repeat / elapsed:>10.0f}"
+            f"{peak_memory(html) / 1024:>10.1f}  {'ok' if not failures else '; '.join(failures)}"
+        )
+
+    print(f"{'total':<22}{'':>8}{len(pages) * args.repeat / total_time:>10.0f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+
+from cachetools import LRUCache, TTLCache
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, create_engine, delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import digest
+
+_metadata = MetaData()
+
+_results = Table(
+    "digest_cache",
+    _metadata,
+    Column("key", String(64), primary_key=True),
+    Column("value", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+)
+_created_at_index = Index("ix_digest_cache_created_at", _results.c.created_at)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+BACKENDS = ("memory", "sqlite", "none")
+
+# Writes between two sweeps of expired and surplus rows in the SQLite tier.
+PRUNE_EVERY = 256
+
+
+def normalize_text(text):
+    """NFC, whitespace collapsed inside paragraphs, paragraphs joined by one blank line.
+
+    Blank lines are kept because the digest treats them as sentence breaks;
+    callers digest this normalized text, so equal keys always mean equal results.
+    """
+    text = unicodedata.normalize("NFC", text)
+    paragraphs = (" ".join(part.split()) for part in _PARAGRAPH_BREAK.split(text))
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+
+
+def cache_key(text, operations, options=None):
+    """Key for digesting `text`; requests that must give the same result share it."""
+    operations = sorted(set(operations))
+    payload = json.dumps(
+        {
+            "text": normalize_text(text),
+            "operations": operations,
+            "options": digest.effective_options(operations, options or {}),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    """Persistent cache table, pruned every PRUNE_EVERY writes to rows younger than
+    `ttl` (0: no expiry) and to at most about `max_rows` of the newest entries."""
+
+    def __init__(self, url, ttl, max_rows=100000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.engine = create_engine(url)
+        _metadata.create_all(self.engine)
+        _created_at_index.create(self.engine, checkfirst=True)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.prune()
+
+    def get(self, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(_results.c.value, _results.c.created_at).where(_results.c.key == key)
+            ).first()
+        if row is None:
+            return None
+        if self.ttl and time.time() - row.created_at > self.ttl:
+            with self.engine.begin() as conn:
+                conn.execute(delete(_results).where(_results.c.key == key))
+            return None
+        return json.loads(row.value)
+
+    def set(self, key, value):
+        stmt = sqlite_insert(_results).values(key=key, value=json.dumps(value), created_at=time.time())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_results.c.key],
+            set_={"value": stmt.excluded.value, "created_at": stmt.excluded.created_at},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        with self.engine.begin() as conn:
+            if self.ttl:
+                conn.execute(delete(_results).where(_results.c.created_at < time.time() - self.ttl))
+            if self.max_rows:
+                cutoff = conn.execute(
+                    select(_results.c.created_at)
+                    .order_by(_results.c.created_at.desc())
+                    .offset(self.max_rows - 1)
+                    .limit(1)
+                ).scalar()
+                if cutoff is not None:
+                    conn.execute(delete(_results).where(_results.c.created_at < cutoff))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(_results))
+
+
+class ResultCache:
+    """Two-tier digest cache: an in-process LRU/TTL map in front of an optional SQLite table.
+
+    A `ttl` of 0 means entries never expire, in both tiers.
+    """
+
+    def __init__(self, size=1024, ttl=3600, backend="memory", db_url=None, db_size=100000):
+        if backend not in BACKENDS:
+            raise ValueError(f"cache backend must be one of: {', '.join(BACKENDS)}")
+        self.enabled = backend != "none" and size > 0
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=max(size, 1), ttl=ttl) if ttl else LRUCache(maxsize=max(size, 1))
+        self.disk = SQLiteTier(db_url, ttl, db_size) if backend == "sqlite" else None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            size=config["CACHE_SIZE"],
+            ttl=config["CACHE_TTL"],
+            backend=config["CACHE_BACKEND"],
+            db_url=config["CACHE_DB_URL"],
+            db_size=config["CACHE_DB_SIZE"],
+        )
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.memory[key] = value
+                    self.stats["disk_hits"] += 1
+                return value
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.memory[key] = value
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "size": len(self.memory),
+                "maxsize": self.memory.maxsize,
+                "ttl": self.ttl,
+                "backend": "sqlite" if self.disk is not None else "memory" if self.enabled else "none",
+            }
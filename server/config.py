@@ -1,3 +1,71 @@
+import os
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     FRONTEND_URL = "http://localhost:5173/"
-    DEBUG = True
+    DEBUG = _flag("FLASK_DEBUG", "0")
+    MAX_BATCH_SIZE = 5000
+
+    # Digest result cache: "memory", "sqlite" (memory in front of SQLite) or "none"; CACHE_TTL=0 never expires.
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+    CACHE_SIZE = int(os.environ.get("CACHE_SIZE", 1024))
+    CACHE_TTL = int(os.environ.get("CACHE_TTL", 3600))
+    CACHE_DB_URL = os.environ.get("CACHE_DB_URL", "sqlite:///digest_cache.db")
+    CACHE_DB_SIZE = int(os.environ.get("CACHE_DB_SIZE", 100000))
+
+    # Streaming digests: chunk bounds in characters and the keyword counter cap.
+    STREAM_MIN_CHUNK = int(os.environ.get("STREAM_MIN_CHUNK", 2048))
+    STREAM_MAX_CHUNK = int(os.environ.get("STREAM_MAX_CHUNK", 16384))
+    STREAM_MAX_TERMS = int(os.environ.get("STREAM_MAX_TERMS", 20000))
+
+    # Link ingestion: concurrent fetches, per-host limit, timeout (seconds), attempts, body cap,
+    # memory for bodies kept for conditional GETs, and refusal of loopback/private/metadata addresses.
+    FETCH_MAX_URLS = int(os.environ.get("FETCH_MAX_URLS", 100))
+    FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 16))
+    FETCH_PER_HOST = int(os.environ.get("FETCH_PER_HOST", 4))
+    FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", 10))
+    FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 3))
+    FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", 5 * 1024 * 1024))
+    FETCH_CACHE_BYTES = int(os.environ.get("FETCH_CACHE_BYTES", 64 * 1024 * 1024))
+    FETCH_BLOCK_PRIVATE = _flag("FETCH_BLOCK_PRIVATE", "1")
+
+    # Digest stage execution: "inline" (request thread), "thread" or "process" (warm worker pool).
+    # Calls beyond WORKERS + QUEUE_SIZE in flight are rejected with HTTP 429.
+    EXECUTOR_MODE = os.environ.get("EXECUTOR_MODE", "inline")
+    # Every WSGI worker gets its own pool, so by default the cores are split between them; WEB_CONCURRENCY
+    # is the WSGI worker count on this node (gunicorn also reads it as its default --workers).
+    WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+    EXECUTOR_WORKERS = int(os.environ.get("EXECUTOR_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+    EXECUTOR_QUEUE_SIZE = int(os.environ.get("EXECUTOR_QUEUE_SIZE", 32))
+    EXECUTOR_RETRY_AFTER = int(os.environ.get("EXECUTOR_RETRY_AFTER", 1))
+
+    # Corpus index: hashed feature space size and number of LDA topics are fixed once the index exists.
+    CORPUS_INDEX_DIR = os.environ.get("CORPUS_INDEX_DIR", "data/corpus")
+    CORPUS_FEATURES = int(os.environ.get("CORPUS_FEATURES", 2 ** 17))
+    CORPUS_TOPICS = int(os.environ.get("CORPUS_TOPICS", 10))
+
+    # Background jobs (long digests, PDF export), persisted so they survive restarts.
+    JOB_DB_URL = os.environ.get("JOB_DB_URL", "sqlite:///jobs.db")
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+    # A running job whose worker has not sent a heartbeat for JOB_LEASE seconds is requeued;
+    # finished jobs (and their PDFs) are deleted after JOB_RETENTION seconds (0 keeps them).
+    JOB_LEASE = int(os.environ.get("JOB_LEASE", 60))
+    JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 7 * 24 * 3600))
+
+    # Sampling profiler: run one request in PROFILE_EVERY under cProfile (0 disables it).
+    PROFILE_EVERY = int(os.environ.get("PROFILE_EVERY", 0))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+    # Set METRICS_DIR to a directory shared by all workers of one server (and emptied when it starts)
+    # to make /metrics report the sum over every worker instead of whichever one answers the scrape.
+    METRICS_DIR = os.environ.get("METRICS_DIR", "")
+    METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+
+    # Startup: PRELOAD makes wsgi.py import the ML stack and map the corpus index before workers
+    # fork, so they share it copy-on-write; WARMUP_ENDPOINT exposes POST /warmup.
+    PRELOAD = _flag("PRELOAD", "1")
+    WARMUP_ENDPOINT = _flag("WARMUP_ENDPOINT", "1")
@@ -0,0 +1,229 @@
+import copy
+import json
+import os
+import threading
+
+from filelock import FileLock
+
+from startup import lazy_import
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+decomposition = lazy_import("sklearn.decomposition")
+feature_text = lazy_import("sklearn.feature_extraction.text")
+sklearn_utils = lazy_import("sklearn.utils")
+
+META_FILE = "meta.json"
+DF_FILE = "df.npy"
+MODEL_FILE = "topics.joblib"
+TERMS_FILE = "terms.json"
+LOCK_FILE = "index.lock"
+
+
+def _atomic_write(path, write, mode="wb"):
+    tmp = path + ".tmp"
+    with open(tmp, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as fh:
+        write(fh)
+    os.replace(tmp, path)
+
+
+def _writable(model):
+    # Arrays loaded with mmap_mode="r" are read-only views of the files on disk;
+    # online updates need private copies, and readers keep the old model meanwhile.
+    model = copy.copy(model)
+    for name, value in vars(model).items():
+        if isinstance(value, np.ndarray):
+            setattr(model, name, np.array(value))
+    return model
+
+
+class CorpusIndex:
+    """Corpus-wide document frequencies and an online LDA topic model, persisted under `path`.
+
+    Terms are hashed into a fixed feature space so new documents never change the
+    array shapes: folding them in is a document-frequency add plus one LDA
+    `partial_fit` step. Arrays are saved as .npy/joblib files and opened with
+    `mmap_mode="r"`, so a cold start maps them instead of reading them in.
+
+    Several processes can share one index: writers hold a file lock and first
+    catch up with whatever another process saved (meta.json carries a
+    generation counter), and readers remap the files when meta.json changes.
+    """
+
+    def __init__(self, path, n_features=2 ** 17, n_topics=10):
+        self.path = path
+        self.vectorizer = feature_text.HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None, stop_words="english"
+        )
+        self._analyzer = self.vectorizer.build_analyzer()
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(path, LOCK_FILE))
+        self._loaded_version = None
+        self.generation = 0
+        self.n_features = n_features
+        self.n_topics = n_topics
+        self.n_docs = 0
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.model = None
+        self.terms = {}
+        self.topic_names = []
+        self.load()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config["CORPUS_INDEX_DIR"],
+            n_features=config["CORPUS_FEATURES"],
+            n_topics=config["CORPUS_TOPICS"],
+        )
+
+    def _meta_version(self):
+        # Every save replaces meta.json, so a new inode or mtime means a new index.
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, META_FILE), encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._file_lock:
+            self._load()
+
+    def _load(self):
+        # Caller holds the file lock, so no writer is halfway through `save`.
+        self._loaded_version = self._meta_version()
+        meta = self._read_meta()
+        if meta is None:
+            return
+        if meta["n_features"] != self.n_features or meta["n_topics"] != self.n_topics:
+            raise ValueError(f"corpus index at {self.path} was built with different feature/topic counts")
+        with open(os.path.join(self.path, TERMS_FILE), encoding="utf-8") as fh:
+            self.terms = {int(bucket): term for bucket, term in json.load(fh).items()}
+        self.n_docs = meta["n_docs"]
+        self.generation = meta.get("generation", 0)
+        self.df = np.load(os.path.join(self.path, DF_FILE), mmap_mode="r")
+        self.model = joblib.load(os.path.join(self.path, MODEL_FILE), mmap_mode="r")
+        self.topic_names = self._name_topics(self.model)
+
+    def refresh(self):
+        """Remap the index if another process has saved a newer one."""
+        if self._meta_version() == self._loaded_version:
+            return
+        with self._lock, self._file_lock:
+            self._load()
+
+    def save(self):
+        # Caller holds the file lock.
+        self.generation += 1
+        meta = {
+            "n_docs": self.n_docs, "n_features": self.n_features, "n_topics": self.n_topics,
+            "generation": self.generation,
+        }
+        _atomic_write(os.path.join(self.path, DF_FILE), lambda fh: np.save(fh, self.df))
+        _atomic_write(os.path.join(self.path, MODEL_FILE), lambda fh: joblib.dump(self.model, fh))
+        _atomic_write(os.path.join(self.path, TERMS_FILE), lambda fh: json.dump(self.terms, fh), mode="w")
+        # meta.json goes last: it is what `load` looks for.
+        _atomic_write(os.path.join(self.path, META_FILE), lambda fh: json.dump(meta, fh), mode="w")
+        self._loaded_version = self._meta_version()
+
+    def _bucket(self, term):
+        return abs(sklearn_utils.murmurhash3_32(term, seed=0)) % self.n_features
+
+    def _name(self, bucket):
+        return self.terms.get(int(bucket), f"#{bucket}")
+
+    def _name_topics(self, model, terms_per_topic=3):
+        # Buckets no document has hit keep their random initial weights; never name a topic after them.
+        seen = np.flatnonzero(np.asarray(self.df) > 0)
+        if not seen.size:
+            return [""] * model.components_.shape[0]
+        weights = model.components_[:, seen]
+        count = min(terms_per_topic, seen.size)
+        top = np.argpartition(-weights, count - 1, axis=1)[:, :count]
+        names = []
+        for topic, columns in enumerate(top):
+            columns = columns[np.argsort(-weights[topic, columns])]
+            names.append(" / ".join(self._name(seen[column]) for column in columns))
+        return names
+
+    def add(self, texts):
+        """Fold new documents into the document frequencies and the topic model, then persist."""
+        texts = [text for text in texts if text and text.strip()]
+        if not texts:
+            return self.n_docs
+        counts = self.vectorizer.transform(texts)
+
+        with self._lock, self._file_lock:
+            meta = self._read_meta()
+            if meta is not None and meta.get("generation", 0) != self.generation:
+                self._load()
+            terms = dict(self.terms)
+            for text in texts:
+                for term in self._analyzer(text):
+                    terms.setdefault(self._bucket(term), term)
+
+            df = np.asarray(self.df) + np.bincount(counts.indices, minlength=self.n_features)
+            if self.model is None:
+                model = decomposition.LatentDirichletAllocation(
+                    n_components=self.n_topics, learning_method="online", random_state=0
+                )
+            else:
+                model = _writable(self.model)
+            model.partial_fit(counts)
+
+            self.terms = terms
+            self.df = df
+            self.model = model
+            self.n_docs += len(texts)
+            self.topic_names = self._name_topics(model)
+            self.save()
+            return self.n_docs
+
+    def query(self, text, num_topics=3, num_keywords=8):
+        """Top corpus topics and TF-IDF keywords for `text`, without touching the index."""
+        self.refresh()
+        counts = self.vectorizer.transform([text])
+        # `add` swaps in new arrays rather than mutating these, so read each reference once.
+        df, model, names, n_docs = self.df, self.model, self.topic_names, self.n_docs
+        # Name keywords after the query's own words: terms the corpus has never seen are not in `self.terms`.
+        own_terms = {}
+        for term in self._analyzer(text):
+            own_terms.setdefault(self._bucket(term), term)
+
+        columns, tf = counts.indices, counts.data
+        idf = np.log((1 + n_docs) / (1 + df[columns])) + 1
+        weights = tf * idf
+        order = np.argsort(-weights)[:num_keywords]
+        top_weight = weights[order[0]] if order.size else 1.0
+        keywords = [
+            {
+                "word": own_terms.get(columns[i]) or self._name(columns[i]),
+                "relevance": int(round(100 * weights[i] / top_weight)),
+            }
+            for i in order
+        ]
+
+        topics = []
+        if model is not None and columns.size:
+            distribution = model.transform(counts)[0]
+            for topic in np.argsort(-distribution)[:num_topics]:
+                topics.append({"name": names[topic], "confidence": int(round(100 * distribution[topic]))})
+        return {"topics": topics, "keywords": keywords}
+
+    def info(self):
+        self.refresh()
+        return {
+            "documents": self.n_docs,
+            "features": self.n_features,
+            "topics": self.n_topics,
+            "vocabulary": len(self.terms),
+            "topic_names": list(self.topic_names),
+        }
@@ -0,0 +1,295 @@
+import re
+import time
+
+from startup import lazy_import
+
+np = lazy_import("numpy")
+sparse = lazy_import("scipy.sparse")
+feature_text = lazy_import("sklearn.feature_extraction.text")
+preprocessing = lazy_import("sklearn.preprocessing")
+
+OPERATIONS = ("summary", "keywords", "topics")
+
+DEFAULT_OPTIONS = {
+    "num_sentences": 3,
+    "num_keywords": 8,
+    "num_topics": 4,
+}
+# The operation each option affects.
+OPTION_OPERATIONS = {
+    "num_sentences": "summary",
+    "num_keywords": "keywords",
+    "num_topics": "topics",
+}
+
+
+def effective_options(operations, options):
+    """`options` with defaults filled in and those the operations ignore dropped."""
+    return {
+        name: options.get(name, default)
+        for name, default in DEFAULT_OPTIONS.items()
+        if OPTION_OPERATIONS[name] in operations
+    }
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def split_sentences(text):
+    return [part.strip() for part in _SENTENCE_SPLIT.split(text) if part and part.strip()]
+
+
+def _empty_result(operations):
+    result = {}
+    if "summary" in operations:
+        result["summary"] = ""
+    if "keywords" in operations:
+        result["keywords"] = []
+    if "topics" in operations:
+        result["topics"] = []
+    return result
+
+
+def _vectorize(sentences, owners, num_docs):
+    """Sublinear TF-IDF rows for `sentences`, with IDF taken over each sentence's own document.
+
+    The vocabulary is shared, but document frequencies are counted per
+    (document, term) pair, so a document's weights are the same as if it had
+    been digested alone.
+    """
+    vectorizer = feature_text.CountVectorizer(stop_words="english")
+    counts = vectorizer.fit_transform(sentences).tocsr()
+    counts.sort_indices()
+
+    rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+    entry_owners = owners[rows]
+    keys = entry_owners.astype(np.int64) * counts.shape[1] + counts.indices
+    _, pair, doc_freq = np.unique(keys, return_inverse=True, return_counts=True)
+    doc_sentences = np.bincount(owners, minlength=num_docs)[entry_owners]
+    idf = np.log((1 + doc_sentences) / (1 + doc_freq[pair.ravel()])) + 1
+
+    data = (1 + np.log(counts.data)) * idf
+    matrix = sparse.csr_matrix((data, counts.indices, counts.indptr), shape=counts.shape)
+    return preprocessing.normalize(matrix), vectorizer.get_feature_names_out()
+
+
+def _summaries(sentences, owners, matrix, doc_matrix, num_docs, num_sentences):
+    # Score every sentence at once by its cosine similarity to its own
+    # document centroid, then keep the best `num_sentences` per document.
+    centroids = preprocessing.normalize(doc_matrix)
+    scores = np.asarray(matrix.multiply(centroids[owners]).sum(axis=1)).ravel()
+
+    order = np.lexsort((-scores, owners))
+    starts = np.searchsorted(owners[order], np.arange(num_docs))
+    rank = np.arange(order.size) - starts[owners[order]]
+    chosen = np.sort(order[rank < num_sentences])
+
+    bounds = np.searchsorted(owners[chosen], np.arange(num_docs + 1))
+    return [
+        " ".join(sentences[i] for i in chosen[bounds[doc]:bounds[doc + 1]])
+        for doc in range(num_docs)
+    ]
+
+
+def _top_row_entries(matrix, row, limit):
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    values = matrix.data[start:end]
+    columns = matrix.indices[start:end]
+    if values.size > limit:
+        keep = np.argpartition(-values, limit - 1)[:limit]
+        values, columns = values[keep], columns[keep]
+    order = np.argsort(-values, kind="stable")
+    return columns[order], values[order]
+
+
+def _keywords(doc_matrix, terms, num_keywords):
+    doc_matrix = doc_matrix.tocsr()
+    keywords = []
+    for row in range(doc_matrix.shape[0]):
+        columns, values = _top_row_entries(doc_matrix, row, num_keywords)
+        top = values[0] if values.size else 1.0
+        keywords.append([
+            {"word": terms[col], "relevance": int(round(100 * value / top))}
+            for col, value in zip(columns, values)
+        ])
+    return keywords
+
+
+def _nndsvda(block, components):
+    # NNDSVD initialisation (Boutsidis & Gallopoulos) with zeros filled by the
+    # block mean, as scikit-learn's "nndsvda"; deterministic, unlike its randomized SVD.
+    u, singular, vt = np.linalg.svd(block, full_matrices=False)
+    w = np.zeros((block.shape[0], components))
+    h = np.zeros((components, block.shape[1]))
+    for j in range(components):
+        x, y = u[:, j], vt[j]
+        if j == 0:
+            x, y, sigma = np.abs(x), np.abs(y), 1.0
+        else:
+            xp, yp = np.maximum(x, 0), np.maximum(y, 0)
+            xn, yn = np.maximum(-x, 0), np.maximum(-y, 0)
+            positive = np.linalg.norm(xp) * np.linalg.norm(yp)
+            negative = np.linalg.norm(xn) * np.linalg.norm(yn)
+            x, y, sigma = (xp, yp, positive) if positive > negative else (xn, yn, negative)
+            if sigma == 0:
+                continue
+            x, y = x / np.linalg.norm(x), y / np.linalg.norm(y)
+        scale = np.sqrt(singular[j] * sigma)
+        w[:, j], h[j] = scale * x, scale * y
+    mean = block.mean()
+    w[w == 0], h[h == 0] = mean, mean
+    return w, h
+
+
+def _gram(factor, membership):
+    # Per-document factor.T @ factor, for every document at once.
+    k = factor.shape[1]
+    return np.stack([membership @ (factor * factor[:, [col]]) for col in range(k)], axis=2)
+
+
+def _hals_update(factor, cross, gram, owners, active):
+    """One HALS sweep over the topic columns of `factor` (rows belong to documents `owners`).
+
+    `cross` is the data times the other factor, `gram` the other factor's
+    per-document Gram matrix; column j is solved exactly with the others fixed.
+    """
+    eps = np.finfo(float).eps
+    factor = factor.copy()
+    for col in range(factor.shape[1]):
+        row_gram = gram[owners, :, col]
+        step = cross[:, col] - np.einsum("rl,rl->r", factor, row_gram)
+        diagonal = np.maximum(row_gram[:, col], eps)
+        factor[:, col] = np.maximum(factor[:, col] + step / diagonal, 0) * active[:, col]
+    return factor
+
+
+def _topics(matrix, owners, terms, membership, num_topics, iterations=50):
+    """Fit a separate NMF topic model for each document, all in one batched solve.
+
+    Every document gets its own factors over its own sentences and terms, so
+    topics never borrow words from other documents in the batch. The factors
+    are stored block-diagonally (sentence x topic, (document, term) x topic)
+    and updated together with HALS sweeps for a fixed number of iterations,
+    so a document's result does not depend on what is solved alongside it.
+    """
+    num_docs, num_terms = membership.shape[0], matrix.shape[1]
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    keys = owners[rows].astype(np.int64) * num_terms + matrix.indices
+    pair_keys, pair = np.unique(keys, return_inverse=True)
+    pair_docs, pair_terms = np.divmod(pair_keys, num_terms)
+    # Sentence x (document, term) view of the matrix, and documents x pairs membership.
+    entries = sparse.csr_matrix((matrix.data, (rows, pair.ravel())), shape=(matrix.shape[0], pair_keys.size))
+    entries_t = entries.T.tocsr()
+    pair_membership = sparse.csr_matrix(
+        (np.ones(pair_keys.size), (pair_docs, np.arange(pair_keys.size))),
+        shape=(num_docs, pair_keys.size),
+    )
+
+    sentence_bounds = np.searchsorted(owners, np.arange(num_docs + 1))
+    pair_bounds = np.searchsorted(pair_docs, np.arange(num_docs + 1))
+    w = np.zeros((matrix.shape[0], num_topics))
+    h = np.zeros((pair_keys.size, num_topics))
+    components_of = np.zeros(num_docs, dtype=int)
+    for doc in range(num_docs):
+        sentences = slice(sentence_bounds[doc], sentence_bounds[doc + 1])
+        pairs = slice(pair_bounds[doc], pair_bounds[doc + 1])
+        block = entries[sentences, pairs].toarray()
+        components = min(num_topics, *block.shape)
+        components_of[doc] = components
+        if components:
+            w_init, h_init = _nndsvda(block, components)
+            w[sentences, :components], h[pairs, :components] = w_init, h_init.T
+
+    # Each document only uses its first `components` topic columns; the rest stay zero.
+    active_w = (np.arange(num_topics) < components_of[owners, None])
+    active_h = (np.arange(num_topics) < components_of[pair_docs, None])
+    for _ in range(iterations):
+        h = _hals_update(h, entries_t @ w, _gram(w, membership), pair_docs, active_h)
+        w = _hals_update(w, entries @ h, _gram(h, pair_membership), owners, active_w)
+
+    doc_topics = np.asarray(membership @ w)
+    totals = doc_topics.sum(axis=1)
+    topics = []
+    for doc in range(num_docs):
+        pairs = slice(pair_bounds[doc], pair_bounds[doc + 1])
+        weights, doc_terms = h[pairs], terms[pair_terms[pairs]]
+        top_terms = np.argsort(-weights, axis=0, kind="stable")[:3]
+        topics.append([
+            {
+                "name": " / ".join(doc_terms[i] for i in top_terms[:, topic] if weights[i, topic] > 0),
+                "confidence": int(round(100 * doc_topics[doc, topic] / totals[doc])),
+            }
+            for topic in np.argsort(-doc_topics[doc], kind="stable")
+            if doc_topics[doc, topic] > 0
+        ])
+    return topics
+
+
+def _lap(timings, stage, start):
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def process_batch(texts, operations=OPERATIONS, timings=None, **options):
+    """Digest `texts` in one vectorized pass; stage durations are added to `timings` if given.
+
+    Each document's result depends only on its own text, never on the rest of the batch.
+    """
+    timings = {} if timings is None else timings
+    opts = {**DEFAULT_OPTIONS, **options}
+    operations = [op for op in operations if op in OPERATIONS]
+    results = [_empty_result(operations) for _ in texts]
+    if not texts or not operations:
+        return results
+
+    sentences = []
+    owners = []
+    for doc, text in enumerate(texts):
+        parts = split_sentences(text or "")
+        sentences.extend(parts)
+        owners.extend([doc] * len(parts))
+    if not sentences:
+        return results
+
+    start = time.perf_counter()
+    owners = np.asarray(owners)
+    num_docs = len(texts)
+    try:
+        matrix, terms = _vectorize(sentences, owners, num_docs)
+    except ValueError:
+        # Nothing but stop words / punctuation in the whole batch.
+        return results
+
+    membership = sparse.csr_matrix(
+        (np.ones(owners.size), (owners, np.arange(owners.size))),
+        shape=(num_docs, owners.size),
+    )
+    doc_matrix = membership @ matrix
+    start = _lap(timings, "vectorize", start)
+
+    if "summary" in operations:
+        for result, summary in zip(results, _summaries(
+                sentences, owners, matrix, doc_matrix, num_docs, opts["num_sentences"])):
+            result["summary"] = summary
+        start = _lap(timings, "summarize", start)
+    if "keywords" in operations:
+        for result, keywords in zip(results, _keywords(doc_matrix, terms, opts["num_keywords"])):
+            result["keywords"] = keywords
+        start = _lap(timings, "keywords", start)
+    if "topics" in operations:
+        for result, topics in zip(results, _topics(matrix, owners, terms, membership, opts["num_topics"])):
+            result["topics"] = topics
+        start = _lap(timings, "topics", start)
+    return results
+
+
+def process_batch_timed(texts, operations=OPERATIONS, **options):
+    # Worker processes cannot fill in the caller's dict, so return the timings.
+    timings = {}
+    return process_batch(texts, operations, timings=timings, **options), timings
+
+
+def warm_up():
+    # Pull in the lazily-initialised parts of numpy, scipy and scikit-learn
+    # (stop word list, LAPACK) so the first real request does not pay for them.
+    process_batch(["Warm up the digest stages. This sentence exists only to fit the models once."])
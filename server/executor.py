@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MODES = ("inline", "thread", "process")
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+def _init_worker():
+    import digest
+    digest.warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+class StageExecutor:
+    """Run CPU-bound digest stages inline, on a thread pool or on a pool of warm worker processes.
+
+    At most `workers + queue_size` calls may be running or waiting at once; beyond
+    that `run` raises `ExecutorSaturated` immediately instead of queueing without bound.
+    """
+
+    def __init__(self, mode="inline", workers=None, queue_size=None):
+        if mode not in MODES:
+            raise ValueError(f"executor mode must be one of: {', '.join(MODES)}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 2 if queue_size is None else queue_size
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            mode=config["EXECUTOR_MODE"],
+            workers=config["EXECUTOR_WORKERS"],
+            queue_size=config["EXECUTOR_QUEUE_SIZE"],
+        )
+
+    def _create_pool(self):
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage")
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker)
+
+    def _get_pool(self):
+        with self._lock:
+            # A pool inherited across fork() has no live workers; build a fresh one.
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = self._create_pool()
+                self._pid = os.getpid()
+            return self._pool
+
+    def start(self):
+        """Create the pool and make every worker run its warm-up before the first request."""
+        if self.mode != "process":
+            # Inline calls and pool threads share this process's modules: warm them here.
+            _init_worker()
+            if self.mode == "inline":
+                return
+        pool = self._get_pool()
+        if self.mode == "process":
+            for future in [pool.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+
+    def run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated(f"{self.workers + self.queue_size} digest tasks already in flight")
+        return self._call(fn, args, kwargs)
+
+    def run_when_free(self, fn, *args, **kwargs):
+        """Like `run`, but wait for a free slot instead of failing; for background jobs."""
+        self._slots.acquire()
+        return self._call(fn, args, kwargs)
+
+    def _call(self, fn, args, kwargs):
+        try:
+            if self.mode == "inline":
+                return fn(*args, **kwargs)
+            return self._get_pool().submit(fn, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
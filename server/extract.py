@@ -0,0 +1,253 @@
+import re
+from html.parser import HTMLParser
+
+from startup import lazy_import
+
+markdown = lazy_import("markdown")
+
+# Elements whose whole subtree is boilerplate.
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "nav", "header", "footer", "aside", "form", "button", "select", "textarea", "head",
+}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "dd", "dt", "td", "th", "tr",
+    "pre", "blockquote", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "table",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Elements that hold the page's content; their class/id never mark them as boilerplate.
+CONTENT_ROOTS = {"html", "body", "article", "main"}
+
+# A class/id token is a boilerplate hint when its first "-"/"_" segment is one of
+# these words: "comments-wrapper" and "sidebar" are, "has-sidebar" is not.
+BOILERPLATE_HINT = re.compile(
+    r"advert\w*|banner|breadcrumbs?|comments?|cookie\w*|disqus|footer|menu|"
+    r"modal|nav\w*|newsletter|popup|promo\w*|related|share|sharing|sidebar|social|sponsor\w*|subscribe|widget",
+    re.IGNORECASE,
+)
+# Too ambiguous as a first segment ("ad-free-content"), so only the whole token counts.
+WHOLE_TOKEN_HINT = re.compile(r"ads?", re.IGNORECASE)
+_TOKEN_SEGMENT = re.compile(r"[-_]")
+
+
+def is_boilerplate_hint(value):
+    return any(
+        WHOLE_TOKEN_HINT.fullmatch(token) or BOILERPLATE_HINT.fullmatch(_TOKEN_SEGMENT.split(token, 1)[0])
+        for token in value.split()
+    )
+
+
+_INVISIBLE = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+# Stands in for <br> while a block is collected (a stray NUL in a page reads as one too).
+_LINE_BREAK = "\x00"
+
+
+def normalize_whitespace(text):
+    text = _INVISIBLE.sub("", text.replace("\r\n", "\n").replace("\r", "\n"))
+    lines = (_SPACE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+class ArticleExtractor(HTMLParser):
+    """Single-pass boilerplate remover driven by per-block tag and link density.
+
+    The page is consumed as a stream of parser events (it can be fed in pieces);
+    no tree is built. Each text block records its character count, how much of
+    it sits inside links and how many tags it contains, and `blocks()` keeps the
+    dense, link-poor ones plus the headings that introduce them.
+    """
+
+    def __init__(self, filter_boilerplate=True, min_words=4, max_link_density=0.33, min_text_density=8.0):
+        super().__init__(convert_charrefs=True)
+        self.filter_boilerplate = filter_boilerplate
+        self.min_words = min_words
+        self.max_link_density = max_link_density
+        self.min_text_density = min_text_density
+        self._stack = []
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._content_depth = 0
+        self._article_depth = 0
+        self._kind = "p"
+        self._parts = []
+        self._link_chars = 0
+        self._tags = 0
+        self._blocks = []
+
+    def _flush(self):
+        raw = "".join(self._parts)
+        if self._kind == "pre":
+            text = raw.replace(_LINE_BREAK, "\n").strip("\n")
+        else:
+            lines = (" ".join(line.split()) for line in raw.split(_LINE_BREAK))
+            text = "\n".join(line for line in lines if line)
+        if text:
+            self._blocks.append((self._kind, text, self._link_chars, self._tags))
+        self._parts = []
+        self._link_chars = 0
+        self._tags = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag not in VOID_TAGS:
+                self._stack.append((tag, True))
+                self._skip_depth += 1
+            return
+
+        # An article's own <header> holds its title, not site chrome.
+        skip = tag in SKIP_TAGS and not (tag == "header" and self._content_depth)
+        if not skip and self.filter_boilerplate:
+            # Inside an article, trust the author's markup over class-name heuristics.
+            hints = tag not in CONTENT_ROOTS and not self._article_depth
+            for name, value in attrs:
+                if hints and name in ("class", "id", "role") and value and is_boilerplate_hint(value):
+                    skip = True
+                    break
+                if name in ("hidden", "aria-hidden") and value != "false":
+                    skip = True
+                    break
+
+        if tag == "br":
+            # A line break inside the block, not the end of it.
+            self._parts.append(_LINE_BREAK)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            if tag in HEADINGS or tag in ("li", "pre", "blockquote"):
+                self._kind = tag
+            else:
+                self._kind = "p"
+        self._tags += 1
+
+        if tag in VOID_TAGS:
+            return
+        self._stack.append((tag, skip))
+        if skip:
+            self._skip_depth += 1
+        elif tag == "a":
+            self._link_depth += 1
+        elif tag in ("article", "main"):
+            self._content_depth += 1
+            if tag == "article":
+                self._article_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Close everything opened after the matching start tag; stray end tags are ignored.
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > depth:
+            name, skipped = self._stack.pop()
+            if skipped:
+                self._skip_depth -= 1
+            elif not self._skip_depth:
+                if name == "a":
+                    self._link_depth -= 1
+                elif name in ("article", "main"):
+                    self._content_depth -= 1
+                    if name == "article":
+                        self._article_depth -= 1
+                if name in BLOCK_TAGS:
+                    self._flush()
+                    self._kind = "p"
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def blocks(self):
+        if not self.filter_boilerplate:
+            return [(kind, text) for kind, text, _, _ in self._blocks]
+
+        keep = []
+        for kind, text, link_chars, tags in self._blocks:
+            chars = len(text)
+            link_density = link_chars / chars
+            text_density = chars / max(tags, 1)
+            if kind in HEADINGS or kind == "pre":
+                good = link_density < 0.5
+            else:
+                good = (
+                    len(text.split()) >= self.min_words
+                    and link_density <= self.max_link_density
+                    and text_density >= self.min_text_density
+                )
+            keep.append(good)
+
+        # A heading only survives if some kept block follows it before the next heading.
+        result = []
+        introduces_content = False
+        for index in range(len(self._blocks) - 1, -1, -1):
+            kind, text, _, _ = self._blocks[index]
+            if kind in HEADINGS:
+                if keep[index] and introduces_content:
+                    result.append((kind, text))
+                introduces_content = False
+            elif keep[index]:
+                result.append((kind, text))
+                introduces_content = True
+        result.reverse()
+        return result
+
+
+def _render(blocks, as_markdown):
+    lines = []
+    for kind, text in blocks:
+        if not as_markdown:
+            lines.append(text)
+        elif kind in HEADINGS:
+            lines.append("#" * HEADINGS[kind] + " " + text)
+        elif kind == "li":
+            lines.append("- " + text)
+        elif kind == "blockquote":
+            lines.append("> " + text)
+        elif kind == "pre":
+            lines.append("```\n" + text + "\n```")
+        else:
+            lines.append(text)
+    return "\n\n".join(lines)
+
+
+def extract_article(html, as_markdown=False, **options):
+    """Return the main article text of an HTML page (a string or an iterable of string pieces)."""
+    extractor = ArticleExtractor(**options)
+    for piece in ([html] if isinstance(html, str) else html):
+        extractor.feed(piece)
+    extractor.close()
+    text = _render(extractor.blocks(), as_markdown)
+    return text if as_markdown else normalize_whitespace(text)
+
+
+def markdown_to_text(source):
+    html = markdown.markdown(source, extensions=["fenced_code", "tables"])
+    return extract_article(html, filter_boilerplate=False)
+
+
+def extract_text(body, content_type=""):
+    content_type = content_type.lower()
+    if "markdown" in content_type:
+        return markdown_to_text(body)
+    if "html" in content_type or (not content_type and body.lstrip()[:1] == "<"):
+        return extract_article(body)
+    return normalize_whitespace(body)
+
+
+def warm_up():
+    markdown_to_text("# Warm up\n\nRender *Markdown* once so its extensions are loaded.")
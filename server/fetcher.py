@@ -0,0 +1,224 @@
+import codecs
+import ipaddress
+import re
+import socket
+import sys
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_REDIRECTS = 5
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+
+
+class RetryableStatus(requests.HTTPError):
+    pass
+
+
+class BlockedAddress(ValueError):
+    pass
+
+
+def _decode_body(body, response):
+    # requests assumes ISO-8859-1 for any text/* response without a charset
+    # parameter, so only trust its guess when the header really names one.
+    if "charset=" in response.headers.get("Content-Type", "").lower():
+        encoding = response.encoding
+    else:
+        match = _META_CHARSET.search(body[:4096])
+        encoding = match.group(1).decode("ascii") if match else None
+        if encoding is None:
+            try:
+                return body.decode("utf-8")
+            except UnicodeDecodeError:
+                encoding = response.apparent_encoding
+    try:
+        codecs.lookup(encoding or "")
+    except LookupError:
+        encoding = "utf-8"
+    return body.decode(encoding, errors="replace")
+
+
+class LinkFetcher:
+    """Fetch many URLs concurrently over one pooled keep-alive session.
+
+    Transient failures are retried with exponential backoff, at most `per_host`
+    requests run against the same host at once, and responses carrying an ETag
+    or Last-Modified header are revalidated with a conditional GET next time.
+    URLs beyond a host's limit wait in a per-host queue rather than in a pool
+    thread, so one busy host never ties up the workers other hosts need. With
+    `block_private`, hosts (and redirect targets) resolving to loopback,
+    private, link-local or other non-public addresses are refused.
+    """
+
+    def __init__(self, max_workers=16, per_host=4, timeout=10, retries=3, backoff=0.5,
+                 max_bytes=5 * 1024 * 1024, cache_bytes=64 * 1024 * 1024, block_private=True, session=None):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.per_host = per_host
+        self.block_private = block_private
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.setdefault("User-Agent", "BlogDigest/1.0")
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(deque)
+        self._hosts_lock = threading.Lock()
+        # Revalidation needs the previous body, so the cache is capped by the
+        # memory its bodies take up rather than by entry count.
+        self._validators = LRUCache(maxsize=cache_bytes, getsizeof=lambda entry: entry["size"])
+        self._validators_lock = threading.Lock()
+        self._fetch = retry(
+            retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, RetryableStatus)),
+            stop=stop_after_attempt(retries),
+            wait=wait_exponential(multiplier=backoff, max=10),
+            reraise=True,
+        )(self._fetch_once)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_workers=config["FETCH_MAX_WORKERS"],
+            per_host=config["FETCH_PER_HOST"],
+            timeout=config["FETCH_TIMEOUT"],
+            retries=config["FETCH_RETRIES"],
+            max_bytes=config["FETCH_MAX_BYTES"],
+            cache_bytes=config["FETCH_CACHE_BYTES"],
+            block_private=config["FETCH_BLOCK_PRIVATE"],
+        )
+
+    def _check_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError("only http and https URLs are supported")
+        if not parts.hostname:
+            raise ValueError(f"no host in {url}")
+        if not self.block_private:
+            return
+        try:
+            infos = socket.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+        except OSError as exc:
+            raise ValueError(f"cannot resolve {parts.hostname}: {exc}") from exc
+        for info in infos:
+            address = ipaddress.ip_address(info[4][0].split("%")[0])
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if not address.is_global:
+                raise BlockedAddress(f"{parts.hostname} resolves to non-public address {address}")
+
+    def _read_body(self, response):
+        body = bytearray()
+        for block in response.iter_content(chunk_size=65536):
+            body.extend(block)
+            if len(body) > self.max_bytes:
+                raise ValueError(f"response larger than {self.max_bytes} bytes")
+        return _decode_body(bytes(body), response)
+
+    def _get(self, url, headers):
+        # Redirects are followed by hand so every hop passes the address check.
+        for _ in range(MAX_REDIRECTS + 1):
+            self._check_url(url)
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True,
+                                        allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            response.close()
+            url = urljoin(url, response.headers["Location"])
+        raise ValueError(f"more than {MAX_REDIRECTS} redirects")
+
+    def _fetch_once(self, url):
+        with self._validators_lock:
+            cached = self._validators.get(url)
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self._get(url, headers) as response:
+            if response.status_code == 304 and cached is not None:
+                return {**cached["result"], "cached": True}
+            if response.status_code in RETRY_STATUSES:
+                raise RetryableStatus(f"{response.status_code} for {url}", response=response)
+            response.raise_for_status()
+            result = {
+                "url": url,
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", ""),
+                "text": self._read_body(response),
+                "cached": False,
+            }
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if etag or last_modified:
+            entry = {"etag": etag, "last_modified": last_modified, "result": result,
+                     "size": sys.getsizeof(result["text"])}
+            with self._validators_lock:
+                try:
+                    self._validators[url] = entry
+                except ValueError:
+                    # Larger than the whole cache: not worth revalidating.
+                    self._validators.pop(url, None)
+        return result
+
+    def fetch(self, url):
+        try:
+            return self._fetch(url)
+        except (requests.RequestException, ValueError) as exc:
+            return {"url": url, "error": str(exc)}
+
+    def _schedule(self, url, future):
+        try:
+            host = urlsplit(url).netloc.lower()
+        except ValueError:
+            future.set_result(self.fetch(url))
+            return
+        with self._hosts_lock:
+            if self._active[host] >= self.per_host:
+                self._waiting[host].append((url, future))
+                return
+            self._active[host] += 1
+        self._pool.submit(self._run, host, url, future)
+
+    def _run(self, host, url, future):
+        try:
+            future.set_result(self.fetch(url))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            # Hand this host's slot straight to its next waiting URL, if any.
+            with self._hosts_lock:
+                waiting = self._waiting.get(host)
+                if waiting:
+                    url, future = waiting.popleft()
+                else:
+                    url = None
+                    self._waiting.pop(host, None)
+                    self._active[host] -= 1
+                    if not self._active[host]:
+                        del self._active[host]
+            if url is not None:
+                self._pool.submit(self._run, host, url, future)
+
+    def fetch_many(self, urls):
+        futures = [Future() for _ in urls]
+        for url, future in zip(urls, futures):
+            self._schedule(url, future)
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,19 @@
+"""Gunicorn settings for the production server; gunicorn loads this file from the working directory.
+
+    cd server && WEB_CONCURRENCY=4 gunicorn
+
+The app is loaded once in the master (see wsgi.py) and every forked worker
+then warms its own executor pool and starts its job queue before it accepts a
+request, so no worker's first digest pays for spawning the pool.
+"""
+import os
+
+wsgi_app = "wsgi:app"
+preload_app = True
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+# config.py splits the cores between workers using the same variable, so set it before the app loads.
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", "4"))
+
+
+def post_worker_init(worker):
+    worker.wsgi.extensions["blog_digest"].start_worker()
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import (
+    Column, Float, Index, LargeBinary, MetaData, String, Table, Text, create_engine, delete, insert, or_, select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_metadata = MetaData()
+
+_jobs = Table(
+    "jobs",
+    _metadata,
+    Column("id", String(32), primary_key=True),
+    Column("kind", String(32), nullable=False),
+    Column("key", String(64), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("result", Text),
+    Column("error", Text),
+    Column("artifact", LargeBinary),
+    Column("artifact_type", String(64)),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    # The worker running the job and when it last said it still is.
+    Column("owner", String(64)),
+    Column("heartbeat_at", Float),
+    Index("ix_jobs_key_status", "key", "status"),
+    Index("ix_jobs_status_updated", "status", "updated_at"),
+)
+# At most one queued or running job per key, across every process sharing the database.
+_active_key = Index(
+    "ux_jobs_active_key", _jobs.c.key, unique=True,
+    sqlite_where=_jobs.c.status.in_(ACTIVE), postgresql_where=_jobs.c.status.in_(ACTIVE),
+)
+
+
+def _create_schema(engine):
+    # Workers starting together all run this; IF NOT EXISTS keeps the losers of
+    # the race between checking for a table and creating it from failing.
+    with engine.begin() as conn:
+        conn.execute(CreateTable(_jobs, if_not_exists=True))
+        for index in _jobs.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+class JobQueue:
+    """Durable background jobs: rows in SQLite, work on a local thread pool.
+
+    `handlers` maps a job kind to a callable taking the payload and returning
+    `(result, artifact, artifact_type)`; result must be JSON-serialisable and the
+    artifact (e.g. a PDF) may be None. Submitting a job identical to one still
+    queued or running returns the existing job instead of starting another.
+
+    Several processes may share one database. A job is claimed with a
+    conditional update, and its owner refreshes a heartbeat while it runs; only
+    jobs whose heartbeat is older than `lease` seconds (their worker is gone) are
+    put back in the queue. Finished jobs are deleted after `retention` seconds.
+    """
+
+    def __init__(self, db_url, handlers, workers=2, lease=60, retention=7 * 24 * 3600):
+        self.engine = create_engine(db_url)
+        _create_schema(self.engine)
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.retention = retention
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._sweeper = None
+
+    @classmethod
+    def from_config(cls, config, handlers):
+        return cls(
+            config["JOB_DB_URL"], handlers, workers=config["JOB_WORKERS"],
+            lease=config["JOB_LEASE"], retention=config["JOB_RETENTION"],
+        )
+
+    def start(self):
+        """Start the worker pool and the sweeper, and pick up jobs nobody is running."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._stopping.clear()
+            self._sweeper = threading.Thread(target=self._sweep_forever, name="job-sweeper", daemon=True)
+            self._sweeper.start()
+        self.sweep(initial=True)
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if self._pool is None or job_id in self._futures:
+                return
+            future = self._futures[job_id] = self._pool.submit(self._run, job_id)
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+
+    def sweep(self, initial=False):
+        """Heartbeat our running jobs, requeue abandoned ones, schedule waiting ones, drop old ones."""
+        now = time.time()
+        with self._lock:
+            local = list(self._futures)
+        with self.engine.begin() as conn:
+            # Only jobs a thread here is still working on: a row left running by
+            # a `_run` that died must let its lease run out.
+            if local:
+                conn.execute(
+                    update(_jobs)
+                    .where(_jobs.c.id.in_(local), _jobs.c.status == RUNNING, _jobs.c.owner == self.worker_id)
+                    .values(heartbeat_at=now)
+                )
+            # Take over jobs whose owner stopped sending heartbeats; the conditional
+            # update makes sure only one sweeping worker requeues each of them.
+            stale = _jobs.c.status == RUNNING, or_(
+                _jobs.c.heartbeat_at.is_(None), _jobs.c.heartbeat_at < now - self.lease
+            )
+            recovered = []
+            for job_id in conn.execute(select(_jobs.c.id).where(*stale)).scalars().all():
+                result = conn.execute(
+                    update(_jobs)
+                    .where(_jobs.c.id == job_id, *stale)
+                    .values(status=QUEUED, owner=None, heartbeat_at=None, updated_at=now)
+                )
+                if result.rowcount == 1:
+                    recovered.append(job_id)
+            if self.retention:
+                conn.execute(
+                    delete(_jobs).where(_jobs.c.status.in_(FINISHED), _jobs.c.updated_at < now - self.retention)
+                )
+            # On start, everything waiting; later, only jobs queued long ago by a
+            # process that is gone. Scheduling twice is harmless: one claim wins.
+            waiting = select(_jobs.c.id).where(_jobs.c.status == QUEUED).order_by(_jobs.c.created_at)
+            if not initial:
+                waiting = waiting.where(_jobs.c.updated_at < now - self.lease)
+            waiting = recovered + conn.execute(waiting).scalars().all()
+        for job_id in waiting:
+            self._schedule(job_id)
+
+    def _sweep_forever(self):
+        while not self._stopping.wait(self.lease / 3):
+            try:
+                self.sweep()
+            except Exception:
+                # A locked or briefly unavailable database must not kill the heartbeat.
+                pass
+
+    def _transition(self, job_id, expected, **values):
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(_jobs)
+                .where(_jobs.c.id == job_id, _jobs.c.status.in_(expected))
+                .values(updated_at=time.time(), **values)
+            )
+        return result.rowcount == 1
+
+    def _run(self, job_id):
+        # Claim the job; if it was cancelled while queued, or another worker
+        # claimed it first, there is nothing to do.
+        if not self._transition(job_id, [QUEUED], status=RUNNING, owner=self.worker_id, heartbeat_at=time.time()):
+            return
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(select(_jobs.c.kind, _jobs.c.payload).where(_jobs.c.id == job_id)).first()
+            result, artifact, artifact_type = self.handlers[row.kind](json.loads(row.payload))
+            # A job cancelled while running keeps its cancelled status; the result is dropped.
+            self._transition(
+                job_id, [RUNNING], status=DONE, result=json.dumps(result),
+                artifact=artifact, artifact_type=artifact_type,
+            )
+        except Exception as exc:
+            try:
+                self._transition(job_id, [RUNNING], status=FAILED, error=str(exc) or type(exc).__name__)
+            except Exception:
+                # The database is unavailable; the heartbeat stops with this
+                # thread, so the lease runs out and the job is retried.
+                pass
+
+    def submit(self, kind, payload):
+        """Queue a job and return `(job_id, created)`; `created` is False for a duplicate."""
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        self.start()
+        body = json.dumps(payload, sort_keys=True)
+        key = hashlib.sha256(f"{kind}\n{body}".encode("utf-8")).hexdigest()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(_jobs).values(
+                    id=job_id, kind=kind, key=key, status=QUEUED, payload=body, created_at=now, updated_at=now,
+                ))
+        except IntegrityError:
+            # The unique index on active keys: an identical job is already queued or running.
+            with self.engine.connect() as conn:
+                existing = conn.execute(
+                    select(_jobs.c.id).where(_jobs.c.key == key, _jobs.c.status.in_(ACTIVE))
+                ).scalar()
+            if existing is None:
+                # It finished in the meantime; try again.
+                return self.submit(kind, payload)
+            return existing, False
+        self._schedule(job_id)
+        return job_id, True
+
+    def get(self, job_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(
+                    _jobs.c.id, _jobs.c.kind, _jobs.c.status, _jobs.c.result, _jobs.c.error,
+                    _jobs.c.artifact_type, _jobs.c.created_at, _jobs.c.updated_at,
+                ).where(_jobs.c.id == job_id)
+            ).first()
+        if row is None:
+            return None
+        return {
+            "id": row.id,
+            "kind": row.kind,
+            "status": row.status,
+            "result": json.loads(row.result) if row.result is not None else None,
+            "error": row.error,
+            "has_artifact": row.artifact_type is not None,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+        }
+
+    def artifact(self, job_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(_jobs.c.artifact, _jobs.c.artifact_type).where(_jobs.c.id == job_id, _jobs.c.status == DONE)
+            ).first()
+        if row is None or row.artifact is None:
+            return None
+        return row.artifact, row.artifact_type
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if it had already finished."""
+        if not self._transition(job_id, ACTIVE, status=CANCELLED):
+            return False
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        return True
+
+    def shutdown(self):
+        self._stopping.set()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,277 @@
+import cProfile
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._series.items()}
+
+    @staticmethod
+    def merge(into, samples):
+        for key, (counts, total, count) in samples.items():
+            series = into.get(key)
+            if series is None:
+                into[key] = [list(counts), total, count]
+            else:
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if samples is None:
+            samples = self.samples()
+        for key, (counts, total, count) in sorted(samples.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """A counter or gauge whose samples are read from `collect()` at scrape time."""
+
+    def __init__(self, name, help, kind, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        return {tuple(sorted(labels.items())): value for labels, value in self.collect()}
+
+    @staticmethod
+    def merge(into, samples):
+        for key, value in samples.items():
+            into[key] = into.get(key, 0) + value
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if samples is None:
+            samples = self.samples()
+        for labels, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Metrics:
+    """Request and stage instrumentation for the Flask app.
+
+    Records per-request latency and payload sizes, per-stage latency, a
+    `Server-Timing` header on every response, and serves everything at
+    `/metrics` in the Prometheus text format. With `profile_every` set, one
+    request in N is run under cProfile and its stats dumped to `profile_dir`.
+
+    Each process keeps its own samples. With `multiprocess_dir` set, every
+    process also writes them to `<pid>.json` there about once per
+    `flush_interval` seconds, and `/metrics` in any worker serves the sum over
+    all the files, so a scrape of a multi-worker server sees the whole server.
+    Counters and histograms of workers that have exited stay in the sums;
+    gauges only count workers that wrote recently.
+    """
+
+    def __init__(self, prefix="blogdigest", profile_every=0, profile_dir="profiles",
+                 multiprocess_dir=None, flush_interval=1.0):
+        self.prefix = prefix
+        self.profile_every = profile_every
+        self.profile_dir = profile_dir
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._requests = itertools.count(1)
+        self._profiling = threading.Lock()
+        self.request_latency = Histogram(
+            f"{prefix}_request_duration_seconds", "Request latency.", ("endpoint", "method", "status"),
+        )
+        self.stage_latency = Histogram(
+            f"{prefix}_stage_duration_seconds", "Latency of one processing stage.", ("stage",),
+        )
+        self.request_size = Histogram(
+            f"{prefix}_request_size_bytes", "Request body size.", ("endpoint",), buckets=SIZE_BUCKETS,
+        )
+        self.response_size = Histogram(
+            f"{prefix}_response_size_bytes", "Response body size (streamed responses excluded).",
+            ("endpoint",), buckets=SIZE_BUCKETS,
+        )
+        self._metrics = [self.request_latency, self.stage_latency, self.request_size, self.response_size]
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            profile_every=config["PROFILE_EVERY"], profile_dir=config["PROFILE_DIR"],
+            multiprocess_dir=config["METRICS_DIR"] or None, flush_interval=config["METRICS_FLUSH_INTERVAL"],
+        )
+
+    def add_callback(self, name, help, kind, collect):
+        self._metrics.append(CallbackMetric(f"{self.prefix}_{name}", help, kind, collect))
+
+    def record_stage(self, name, seconds):
+        self.stage_latency.observe(seconds, stage=name)
+        if has_request_context() and "timings" in g:
+            g.timings.append((name, seconds))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def _flush(self):
+        snapshot = {
+            metric.name: [[list(key), value] for key, value in metric.samples().items()]
+            for metric in self._metrics
+        }
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(snapshot, fh)
+        os.replace(path + ".tmp", path)
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self._flush()
+            except OSError:
+                pass
+
+    def _start_flusher(self):
+        # Workers forked from a preloading master do not inherit its threads,
+        # so each process starts its own on its first request.
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == pid:
+                return
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+            self._flusher_pid = pid
+
+    def _merged_samples(self):
+        self._flush()
+        merged = {metric.name: {} for metric in self._metrics}
+        # A file this old belongs to a worker that is gone (the live ones rewrite theirs constantly).
+        stale = time.time() - 5 * self.flush_interval
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "*.json")):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    snapshot = json.load(fh)
+                live = os.stat(path).st_mtime >= stale
+            except (OSError, ValueError):
+                continue
+            for metric in self._metrics:
+                if getattr(metric, "kind", None) == "gauge" and not live:
+                    continue
+                samples = {
+                    tuple(tuple(part) if isinstance(part, list) else part for part in key): value
+                    for key, value in snapshot.get(metric.name, ())
+                }
+                metric.merge(merged[metric.name], samples)
+        return merged
+
+    def render(self):
+        merged = self._merged_samples() if self.multiprocess_dir else {}
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged.get(metric.name)))
+        return "\n".join(lines) + "\n"
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics_view)
+
+    def _metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def _before_request(self):
+        if self.multiprocess_dir:
+            self._start_flusher()
+        g.request_start = time.perf_counter()
+        g.timings = []
+        if self.profile_every and next(self._requests) % self.profile_every == 0:
+            # cProfile cannot run two profilers at once; skip the sample if one is active.
+            if self._profiling.acquire(blocking=False):
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+
+    def _after_request(self, response):
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or "unmatched"
+        self.request_latency.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        if request.content_length:
+            self.request_size.observe(request.content_length, endpoint=endpoint)
+        if not response.is_streamed:
+            self.response_size.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in g.timings]
+        entries.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    def _teardown_request(self, exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = f"{time.time_ns()}-{os.getpid()}-{request.endpoint or 'unmatched'}.prof"
+            profiler.dump_stats(os.path.join(self.profile_dir, name))
+        finally:
+            self._profiling.release()
@@ -0,0 +1,90 @@
+import textwrap
+import unicodedata
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+FONT_SIZE = 11
+TITLE_SIZE = 16
+LEADING = 15
+# Helvetica averages about half an em per character, close enough for wrapping.
+CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.5))
+LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING)
+
+
+def _escape(text):
+    text = text.encode("cp1252", errors="replace").decode("cp1252")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _check_encodable(text):
+    # The built-in fonts only cover Windows-1252. A stray symbol or emoji becomes
+    # "?", but words in another script would come out unreadable, so refuse them.
+    missing = sorted({
+        char for char in text
+        if unicodedata.category(char).startswith("L") and not char.encode("cp1252", errors="ignore")
+    })
+    if missing:
+        raise ValueError(
+            "PDF export only supports Latin (Windows-1252) text; unsupported letters: " + "".join(missing[:10])
+        )
+
+
+def _layout(title, text):
+    lines = []
+    if title:
+        lines.append(("F2", TITLE_SIZE, title))
+        lines.append(("F1", FONT_SIZE, ""))
+    for paragraph in text.split("\n\n"):
+        for line in textwrap.wrap(" ".join(paragraph.split()), CHARS_PER_LINE) or [""]:
+            lines.append(("F1", FONT_SIZE, line))
+        lines.append(("F1", FONT_SIZE, ""))
+    while lines and not lines[-1][2]:
+        lines.pop()
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+
+def _content_stream(lines):
+    ops = ["BT", f"{LEADING} TL", f"{MARGIN} {PAGE_HEIGHT - MARGIN} Td"]
+    for font, size, line in lines:
+        ops.append(f"/{font} {size} Tf ({_escape(line)}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("cp1252")
+
+
+def render_pdf(text, title=""):
+    """Render plain text as a paginated Letter-size PDF using the built-in Helvetica fonts.
+
+    Raises ValueError if the text contains letters the fonts cannot show.
+    """
+    _check_encodable(title + text)
+    pages = _layout(title, text)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        stream = _content_stream(lines)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_ref} 0 R >>"
+        ).encode())
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
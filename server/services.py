@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+
+import digest
+import startup
+from cache import ResultCache, cache_key, normalize_text
+from corpus_index import CorpusIndex
+from executor import StageExecutor
+from extract import extract_text
+from fetcher import LinkFetcher
+from jobs import JobQueue
+from pdf import render_pdf
+from validation import parse_digest_request, parse_job_texts, parse_text_format
+
+# Components holding only read-only, file-backed state; safe to inherit across fork().
+FORK_SAFE = {"corpus"}
+
+logger = logging.getLogger(__name__)
+
+
+class Services:
+    """The app's per-process components (cache, fetcher, executor, corpus index, jobs), built on first use.
+
+    Creating the app builds none of them, so a pre-fork master stays cheap: it
+    can `warm_up(fork_safe=True)` to import the ML stack and map the corpus index,
+    which workers then share copy-on-write, while thread pools, process pools and
+    database connections are only ever created inside the worker that uses them.
+    """
+
+    def __init__(self, config, metrics):
+        self.config = config
+        self.metrics = metrics
+        self._components = {}
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._started = None
+
+    def _get(self, name, factory):
+        if self._pid != os.getpid():
+            # Forked: drop anything that owns threads, sockets or connections.
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._components = {k: v for k, v in self._components.items() if k in FORK_SAFE}
+                    self._pid = os.getpid()
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = factory()
+        return component
+
+    def built(self, name):
+        """Return a component only if it already exists in this process."""
+        return self._components.get(name) if self._pid == os.getpid() else None
+
+    @property
+    def cache(self):
+        return self._get("cache", lambda: ResultCache.from_config(self.config))
+
+    @property
+    def fetcher(self):
+        return self._get("fetcher", lambda: LinkFetcher.from_config(self.config))
+
+    @property
+    def executor(self):
+        return self._get("executor", lambda: StageExecutor.from_config(self.config))
+
+    @property
+    def corpus(self):
+        return self._get("corpus", lambda: CorpusIndex.from_config(self.config))
+
+    @property
+    def jobs(self):
+        handlers = {"digest": self.digest_job, "pdf": self.pdf_job}
+        return self._get("jobs", lambda: JobQueue.from_config(self.config, handlers))
+
+    def start_jobs(self):
+        """Once per process: start the job queue, resuming jobs left over from a previous run."""
+        if self._started == os.getpid():
+            return self.jobs
+        with self._lock:
+            if self._started != os.getpid():
+                self.jobs.start()
+                self._started = os.getpid()
+        return self.jobs
+
+    def start_worker(self):
+        """Per-worker startup hook: warm the executor pool and start the job queue.
+
+        A failure is logged rather than raised: the digest endpoints do not need
+        either, and the jobs endpoints try again when they are first used.
+        """
+        for name, start in (("executor", lambda: self.executor.start()), ("job queue", self.start_jobs)):
+            try:
+                start()
+            except Exception:
+                logger.exception("could not start the %s", name)
+
+    def warm_up(self, stages=None, fork_safe=False):
+        """Load stage dependencies ahead of the first request; returns seconds spent per stage.
+
+        With `fork_safe` the executor is left alone, since starting it would
+        create pools that must not be inherited by forked workers.
+        """
+        available = list(startup.STAGES) + ["corpus"] + ([] if fork_safe else ["executor"])
+        stages = available if stages is None else stages
+        unknown = [stage for stage in stages if stage not in available]
+        if unknown:
+            raise ValueError(f"unknown stages: {', '.join(unknown)}")
+
+        timings = startup.warm_up([stage for stage in stages if stage in startup.STAGES])
+        if "corpus" in stages:
+            start = time.perf_counter()
+            self.corpus
+            timings["corpus"] = time.perf_counter() - start
+        if "executor" in stages:
+            start = time.perf_counter()
+            self.executor.start()
+            timings["executor"] = time.perf_counter() - start
+        return timings
+
+    def extract_texts(self, texts, content_type):
+        with self.metrics.stage("extract"):
+            return [extract_text(text, content_type) for text in texts]
+
+    def run_digest(self, texts, operations, options, wait=False):
+        # Results are cached per post: process_batch gives each post the same
+        # result whatever else is in the batch, and it runs on the normalized
+        # text, so one key never stands for two different results.
+        cache = self.cache
+        with self.metrics.stage("cache"):
+            texts = [normalize_text(text) for text in texts]
+            keys = [cache_key(text, operations, options) for text in texts]
+            results = [cache.get(key) for key in keys]
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            run = self.executor.run_when_free if wait else self.executor.run
+            computed, timings = run(digest.process_batch_timed, [texts[i] for i in missing], operations, **options)
+            for stage, seconds in timings.items():
+                self.metrics.record_stage(stage, seconds)
+            for i, result in zip(missing, computed):
+                cache.set(keys[i], result)
+                results[i] = result
+        return results
+
+    def digest_job(self, payload):
+        operations, options, content_type = parse_digest_request(payload)
+        texts = self.extract_texts(parse_job_texts(payload, self.config["MAX_BATCH_SIZE"]), content_type)
+        return self.run_digest(texts, operations, options, wait=True), None, None
+
+    def pdf_job(self, payload):
+        text = self.extract_texts([payload.get("text", "")], parse_text_format(payload))[0]
+        title = payload.get("title", "")
+        if payload.get("summary"):
+            _, options, _ = parse_digest_request(payload)
+            summary = self.run_digest([text], ["summary"], options, wait=True)[0]["summary"]
+            text = f"Summary\n\n{summary}\n\n{text}"
+        document = render_pdf(text, title=title)
+        return {"size": len(document)}, document, "application/pdf"
+
+    def shutdown(self):
+        for name in ("jobs", "executor"):
+            component = self.built(name)
+            if component is not None:
+                component.shutdown()
+        fetcher = self.built("fetcher")
+        if fetcher is not None:
+            fetcher.close()
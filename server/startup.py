@@ -0,0 +1,55 @@
+import importlib
+import threading
+import time
+
+# Stage name -> module whose `warm_up()` imports and initialises that stage's dependencies.
+STAGES = {
+    "digest": "digest",
+    "streaming": "streaming",
+    "extract": "extract",
+}
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Unlike `importlib.util.LazyLoader` this never touches the parent package
+    until then, so `lazy_import("sklearn.decomposition")` costs nothing at import time.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def warm_up(stages=None):
+    """Import and initialise the given stages (all by default); returns seconds spent per stage."""
+    stages = list(STAGES) if stages is None else stages
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stages: {', '.join(unknown)}")
+    timings = {}
+    for stage in stages:
+        start = time.perf_counter()
+        importlib.import_module(STAGES[stage]).warm_up()
+        timings[stage] = time.perf_counter() - start
+    return timings
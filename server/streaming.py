@@ -0,0 +1,146 @@
+import codecs
+import heapq
+import json
+import math
+import re
+from collections import Counter
+
+from digest import split_sentences
+from startup import lazy_import
+
+feature_text = lazy_import("sklearn.feature_extraction.text")
+
+_TOKEN = re.compile(r"\b\w\w+\b")
+_PARAGRAPH = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"[.!?]\s")
+
+MAX_SENTENCE_CHARS = 1000
+
+
+def _find_cut(buffer, min_chunk, max_chunk):
+    if len(buffer) < min_chunk:
+        return None
+    window = buffer[:max_chunk]
+    # Only breaks past `min_chunk` count, so no chunk but the last comes out shorter.
+    breaks = [match.end() for match in _PARAGRAPH.finditer(window, min_chunk)]
+    if breaks:
+        return breaks[-1]
+    if len(buffer) < max_chunk:
+        return None
+    ends = [match.end() for match in _SENTENCE_END.finditer(window, min_chunk)]
+    if ends:
+        return ends[-1]
+    space = window.rfind(" ", min_chunk)
+    return space + 1 if space > 0 else max_chunk
+
+
+def iter_text_chunks(stream, min_chunk=2048, max_chunk=16384, block_size=65536, encoding="utf-8"):
+    """Yield paragraph-aligned chunks of a byte stream without reading it all into memory.
+
+    Chunks are at least `min_chunk` characters (except the last) and never more than
+    `max_chunk`; a paragraph longer than that is split at a sentence end or a space.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    while True:
+        block = stream.read(block_size)
+        buffer += decoder.decode(block, final=not block)
+        while True:
+            cut = _find_cut(buffer, min_chunk, max_chunk)
+            if cut is None:
+                break
+            chunk, buffer = buffer[:cut], buffer[cut:]
+            if chunk.strip():
+                yield chunk.strip()
+        if not block:
+            break
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def _terms(text):
+    stop_words = feature_text.ENGLISH_STOP_WORDS
+    return [token for token in _TOKEN.findall(text.lower()) if token not in stop_words]
+
+
+class StreamingDigest:
+    """Running summary candidates and keyword counts over a stream of text chunks.
+
+    Memory is bounded by `max_terms` keyword counters and a pool of
+    `num_sentences * pool_factor` candidate sentences, however long the input is.
+    """
+
+    def __init__(self, num_sentences=3, num_keywords=8, max_terms=20000, pool_factor=4):
+        self.num_sentences = num_sentences
+        self.num_keywords = num_keywords
+        self.max_terms = max_terms
+        self.pool_size = num_sentences * pool_factor
+        self.counts = Counter()
+        self.candidates = []
+        self.chunks = 0
+        self.sentences = 0
+
+    def _score(self, terms):
+        if not terms:
+            return 0.0
+        unique = set(terms)
+        return sum(math.log1p(self.counts[term]) for term in unique) / math.sqrt(len(unique))
+
+    def update(self, chunk):
+        self.chunks += 1
+        fresh = []
+        for sentence in split_sentences(chunk):
+            sentence = sentence[:MAX_SENTENCE_CHARS]
+            terms = _terms(sentence)
+            self.counts.update(terms)
+            fresh.append((self.sentences, sentence, terms))
+            self.sentences += 1
+
+        if len(self.counts) > self.max_terms:
+            self.counts = Counter(dict(self.counts.most_common(self.max_terms // 2)))
+
+        pool = self.candidates + fresh
+        self.candidates = heapq.nlargest(self.pool_size, pool, key=lambda item: self._score(item[2]))
+        return self.snapshot()
+
+    def summary(self):
+        best = heapq.nlargest(self.num_sentences, self.candidates, key=lambda item: self._score(item[2]))
+        return " ".join(sentence for _, sentence, _ in sorted(best))
+
+    def keywords(self):
+        top = self.counts.most_common(self.num_keywords)
+        if not top:
+            return []
+        peak = top[0][1]
+        return [
+            {"word": word, "count": count, "relevance": int(round(100 * count / peak))}
+            for word, count in top
+        ]
+
+    def snapshot(self, done=False):
+        return {
+            "chunk": self.chunks,
+            "sentences": self.sentences,
+            "summary": self.summary(),
+            "keywords": self.keywords(),
+            "done": done,
+        }
+
+
+def format_event(payload, fmt):
+    data = json.dumps(payload)
+    if fmt == "sse":
+        event = "done" if payload.get("done") else "partial"
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def stream_digest(chunks, fmt="ndjson", **options):
+    state = StreamingDigest(**options)
+    for chunk in chunks:
+        yield format_event(state.update(chunk), fmt)
+    yield format_event(state.snapshot(done=True), fmt)
+
+
+def warm_up():
+    StreamingDigest().update("Warm up the streaming digest. It loads the stop word list.")
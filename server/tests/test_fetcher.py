@@ -0,0 +1,214 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import create_app
+from config import Config
+from fetcher import LinkFetcher
+
+POST = (
+    "<html><body><nav><a href='/'>Home</a></nav><article><h1>Caching</h1>"
+    "<p>A cache keeps recent results close to the code that needs them again.</p>"
+    "<p>Expiry decides how long a cached result may be served before it is computed again.</p>"
+    "</article></body></html>"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+
+        if self.path == "/flaky":
+            if hits < 3:
+                self._send(503)
+            else:
+                self._send(200, b"finally", [("Content-Type", "text/plain")])
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                server.not_modified += 1
+                self._send(304, headers=[("ETag", '"v1"')])
+            else:
+                self._send(200, b"versioned body", [("Content-Type", "text/plain"), ("ETag", '"v1"')])
+        elif self.path == "/meta-charset":
+            body = '<html><head><meta charset="utf-8"></head><body>résumé</body></html>'.encode("utf-8")
+            self._send(200, body, [("Content-Type", "text/html")])
+        elif self.path == "/redirect":
+            self._send(302, headers=[("Location", "/flaky")])
+        elif self.path == "/post":
+            self._send(200, POST.encode("utf-8"), [("Content-Type", "text/html; charset=utf-8")])
+        elif self.path.startswith("/blocked"):
+            with server.lock:
+                server.in_flight += 1
+                server.peak = max(server.peak, server.in_flight)
+            server.release.wait(10)
+            with server.lock:
+                server.in_flight -= 1
+            self._send(200, b"blocked", [("Content-Type", "text/plain")])
+        elif self.path.startswith("/slow"):
+            with server.lock:
+                server.in_flight += 1
+                server.peak = max(server.peak, server.in_flight)
+            time.sleep(0.1)
+            with server.lock:
+                server.in_flight -= 1
+            self._send(200, b"slow", [("Content-Type", "text/plain")])
+        else:
+            self._send(404)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.hits = {}
+    server.not_modified = 0
+    server.in_flight = 0
+    server.peak = 0
+    server.release = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = LinkFetcher(max_workers=4, per_host=2, timeout=5, retries=3, backoff=0.01, block_private=False)
+    yield fetcher
+    fetcher.close()
+
+
+def test_retries_transient_status(stub, fetcher):
+    server, base = stub
+    result = fetcher.fetch(f"{base}/flaky")
+    assert result["status"] == 200
+    assert result["text"] == "finally"
+    assert server.hits["/flaky"] == 3
+
+
+def test_reuses_body_on_304(stub, fetcher):
+    server, base = stub
+    first = fetcher.fetch(f"{base}/etag")
+    second = fetcher.fetch(f"{base}/etag")
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["text"] == "versioned body"
+    assert server.not_modified == 1
+
+
+def test_per_host_limit(stub, fetcher):
+    server, base = stub
+    results = fetcher.fetch_many([f"{base}/slow/{i}" for i in range(8)])
+    assert [result["text"] for result in results] == ["slow"] * 8
+    assert server.peak == 2
+
+
+def test_busy_host_does_not_hold_other_hosts_back(stub, fetcher):
+    server, base = stub
+    other = base.replace("127.0.0.1", "localhost")
+    waiting = threading.Thread(target=fetcher.fetch_many, args=([f"{base}/blocked/{i}" for i in range(12)],))
+    waiting.start()
+    deadline = time.monotonic() + 5
+    while server.in_flight < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.in_flight == 2
+    # Only two of the four pool threads may serve the busy host; the rest stay
+    # free, so the other host is served while every busy-host request is stuck.
+    results = []
+    other_fetch = threading.Thread(target=lambda: results.extend(fetcher.fetch_many([f"{other}/meta-charset"])))
+    other_fetch.start()
+    other_fetch.join(5)
+    assert results and results[0]["status"] == 200
+    assert waiting.is_alive()
+    server.release.set()
+    waiting.join()
+    assert server.peak == 2
+
+
+def test_meta_charset_without_header_charset(stub, fetcher):
+    _, base = stub
+    assert "résumé" in fetcher.fetch(f"{base}/meta-charset")["text"]
+
+
+def test_malformed_url_is_an_error_entry(fetcher):
+    result = fetcher.fetch_many(["http://[bad", "ftp://example.com/"])
+    assert all("error" in entry for entry in result)
+
+
+def test_blocks_private_addresses(stub):
+    _, base = stub
+    fetcher = LinkFetcher(block_private=True)
+    try:
+        assert "non-public" in fetcher.fetch(f"{base}/flaky")["error"]
+    finally:
+        fetcher.close()
+
+
+def test_follows_redirects(stub, fetcher):
+    server, base = stub
+    assert fetcher.fetch(f"{base}/redirect")["text"] == "finally"
+
+
+class LinksConfig(Config):
+    CACHE_BACKEND = "none"
+    EXECUTOR_MODE = "inline"
+    FETCH_BLOCK_PRIVATE = False
+    FETCH_RETRIES = 1
+    WARMUP_ENDPOINT = False
+
+
+@pytest.fixture
+def client(tmp_path):
+    class TestConfig(LinksConfig):
+        JOB_DB_URL = f"sqlite:///{tmp_path / 'jobs.db'}"
+        CORPUS_INDEX_DIR = str(tmp_path / "corpus")
+
+    app = create_app(TestConfig)
+    yield app.test_client()
+    app.extensions["blog_digest"].shutdown()
+
+
+def test_process_links_pairs_results_with_urls(stub, client):
+    _, base = stub
+    urls = [f"{base}/post", f"{base}/missing", "ftp://example.com/", f"{base}/post"]
+    response = client.post("/process/links", json={"urls": urls, "operations": ["summary"]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["url"] for result in results] == urls
+    assert "404" in results[1]["error"]
+    assert "error" in results[2]
+    for result in (results[0], results[3]):
+        assert result["status"] == 200
+        assert "cache keeps recent results" in result["result"]["summary"]
+        assert "Home" not in result["result"]["summary"]
+
+
+def test_process_links_single_url_and_empty_list(stub, client):
+    _, base = stub
+    response = client.post("/process/links", json={"url": f"{base}/post"})
+    assert [result["url"] for result in response.get_json()["results"]] == [f"{base}/post"]
+    response = client.post("/process/links", json={"urls": []})
+    assert response.status_code == 200
+    assert response.get_json() == {"results": []}
+    assert client.post("/process/links", json={"urls": "not a list"}).status_code == 400
+    response = client.post("/process/links", json={"urls": [], "num_keywords": 0})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "num_keywords must be a positive integer"}
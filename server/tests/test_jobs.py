@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import insert, update
+
+from jobs import QUEUED, RUNNING, JobQueue, _jobs
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class Handlers:
+    """Job handlers that record their calls; "digest" blocks until `release` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def digest(self, payload):
+        with self.lock:
+            self.calls.append(payload)
+        self.release.wait(10)
+        return {"texts": len(payload.get("texts", []))}, None, None
+
+    def pdf(self, payload):
+        return {"size": 3}, b"%PDF", "application/pdf"
+
+    def as_dict(self):
+        return {"digest": self.digest, "pdf": self.pdf}
+
+
+@pytest.fixture
+def handlers():
+    handlers = Handlers()
+    yield handlers
+    handlers.release.set()
+
+
+@pytest.fixture
+def make_queue(tmp_path, handlers):
+    queues = []
+
+    def make(**options):
+        options = {"workers": 2, "lease": 1, **options}
+        queue = JobQueue(f"sqlite:///{tmp_path / 'jobs.db'}", options.pop("handlers", handlers.as_dict()), **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    handlers.release.set()
+    for queue in queues:
+        queue.shutdown()
+
+
+def status(queue, job_id):
+    job = queue.get(job_id)
+    return job and job["status"]
+
+
+def test_runs_job_and_stores_artifact(make_queue):
+    queue = make_queue()
+    job_id, created = queue.submit("pdf", {"text": "hello"})
+    assert created
+    assert wait_for(lambda: status(queue, job_id) == "done")
+    assert queue.get(job_id)["result"] == {"size": 3}
+    assert queue.artifact(job_id) == (b"%PDF", "application/pdf")
+
+
+def test_duplicate_of_active_job_across_queues(make_queue, handlers):
+    first, second = make_queue(), make_queue()
+    job_id, created = first.submit("digest", {"texts": ["a"]})
+    assert wait_for(lambda: status(first, job_id) == "running")
+    assert second.submit("digest", {"texts": ["a"]}) == (job_id, False)
+    assert second.submit("digest", {"texts": ["b"]})[1] is True
+
+    handlers.release.set()
+    assert wait_for(lambda: status(first, job_id) == "done")
+    # Once the first one has finished, the same payload runs again.
+    assert second.submit("digest", {"texts": ["a"]})[1] is True
+
+
+def test_live_worker_keeps_its_running_job(make_queue, handlers):
+    owner = make_queue()
+    job_id, _ = owner.submit("digest", {"texts": ["a"]})
+    assert wait_for(lambda: status(owner, job_id) == "running")
+
+    other = make_queue()
+    other.start()
+    time.sleep(1.5)  # longer than the lease; the owner's sweeper keeps it fresh
+    other.sweep()
+    assert len(handlers.calls) == 1
+    handlers.release.set()
+    assert wait_for(lambda: status(owner, job_id) == "done")
+    assert len(handlers.calls) == 1
+
+
+def test_job_of_a_dead_worker_is_recovered(make_queue, handlers):
+    dead = make_queue()
+    job_id, _ = dead.submit("digest", {"texts": ["a"]})
+    assert wait_for(lambda: status(dead, job_id) == "running")
+    dead._stopping.set()  # its heartbeat stops, as if the process had died
+
+    survivor = make_queue()
+    survivor.start()
+    assert wait_for(lambda: len(handlers.calls) == 2)
+    handlers.release.set()
+    assert wait_for(lambda: status(survivor, job_id) == "done")
+
+
+def test_restart_resumes_queued_jobs(make_queue):
+    queue = make_queue()
+    # A job left queued by a process that stopped before running it.
+    now = time.time()
+    with queue.engine.begin() as conn:
+        conn.execute(insert(_jobs).values(
+            id="left-over", kind="pdf", key="k", status=QUEUED, payload="{}", created_at=now, updated_at=now,
+        ))
+    queue.start()
+    assert wait_for(lambda: status(queue, "left-over") == "done")
+
+
+def test_cancel(make_queue, handlers):
+    queue = make_queue(workers=1)
+    running, _ = queue.submit("digest", {"texts": ["a"]})
+    queued, _ = queue.submit("digest", {"texts": ["b"]})
+    assert wait_for(lambda: status(queue, running) == "running")
+
+    assert queue.cancel(queued)
+    assert queue.cancel(running)
+    handlers.release.set()
+    assert wait_for(lambda: not queue._futures)
+    assert status(queue, running) == "cancelled"
+    assert status(queue, queued) == "cancelled"
+    assert [call["texts"] for call in handlers.calls] == [["a"]]
+    assert not queue.cancel(running)
+
+
+def test_handler_errors_fail_the_job(make_queue):
+    def broken(payload):
+        raise ValueError("no good")
+
+    def unserialisable(payload):
+        return {"when": object()}, None, None
+
+    queue = make_queue(handlers={"digest": broken, "pdf": unserialisable})
+    failed, _ = queue.submit("digest", {})
+    unsaved, _ = queue.submit("pdf", {})
+    assert wait_for(lambda: status(queue, failed) == "failed" and status(queue, unsaved) == "failed")
+    assert queue.get(failed)["error"] == "no good"
+    assert "not JSON serializable" in queue.get(unsaved)["error"]
+
+
+def test_orphaned_running_row_is_not_kept_alive(make_queue):
+    queue = make_queue()
+    job_id, _ = queue.submit("pdf", {})
+    assert wait_for(lambda: status(queue, job_id) == "done")
+    # A row this worker claimed but no thread is working on any more.
+    with queue.engine.begin() as conn:
+        conn.execute(update(_jobs).where(_jobs.c.id == job_id).values(
+            status=RUNNING, owner=queue.worker_id, heartbeat_at=time.time() - 10,
+        ))
+    queue.sweep()
+    assert wait_for(lambda: status(queue, job_id) == "done")
+
+
+def test_finished_jobs_expire(make_queue):
+    queue = make_queue(retention=1)
+    job_id, _ = queue.submit("pdf", {})
+    assert wait_for(lambda: status(queue, job_id) == "done")
+    queue.sweep()
+    assert queue.get(job_id) is not None
+    time.sleep(1.1)
+    queue.sweep()
+    assert queue.get(job_id) is None
@@ -0,0 +1,97 @@
+import digest
+
+TEXT_FORMATS = {"text": "text/plain", "html": "text/html", "markdown": "text/markdown"}
+JOB_KINDS = ("digest", "pdf")
+
+
+class InvalidRequest(ValueError):
+    """The request is malformed or fails validation; the app answers it with a 400."""
+
+
+def parse_positive_int(name, value):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise InvalidRequest(f"{name} must be a positive integer")
+    return value
+
+
+def parse_query_ints(args, names):
+    """Positive integers given as query-string parameters, e.g. `?num_keywords=5`."""
+    options = {}
+    for name in names:
+        value = args.get(name)
+        if value is not None:
+            try:
+                value = int(value)
+            except ValueError:
+                value = 0
+            options[name] = parse_positive_int(name, value)
+    return options
+
+
+def parse_text(data):
+    text = data.get("text")
+    if not isinstance(text, str):
+        raise InvalidRequest("text is required and must be a string")
+    return text
+
+
+def parse_urls(data, max_urls):
+    urls = data.get("urls")
+    if urls is None and "url" in data:
+        urls = [data["url"]]
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        raise InvalidRequest("urls (a list of strings) or url (a string) is required")
+    if len(urls) > max_urls:
+        raise InvalidRequest(f"at most {max_urls} urls per request")
+    return urls
+
+
+def parse_text_format(data):
+    text_format = data.get("format", "text")
+    if not isinstance(text_format, str) or text_format not in TEXT_FORMATS:
+        raise InvalidRequest(f"format must be one of: {', '.join(TEXT_FORMATS)}")
+    return TEXT_FORMATS[text_format]
+
+
+def parse_digest_request(data):
+    operations = data.get("operations") or list(digest.OPERATIONS)
+    if isinstance(operations, str):
+        operations = [operations]
+    if not isinstance(operations, list) or not all(isinstance(op, str) for op in operations):
+        raise InvalidRequest("operations must be a list of strings")
+    unknown = [op for op in operations if op not in digest.OPERATIONS]
+    if unknown:
+        raise InvalidRequest(f"unknown operations: {', '.join(unknown)}")
+
+    content_type = parse_text_format(data)
+
+    options = {}
+    for name in digest.DEFAULT_OPTIONS:
+        if name in data:
+            options[name] = parse_positive_int(name, data[name])
+    return operations, options, content_type
+
+
+def parse_texts(data, max_batch):
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise InvalidRequest("texts must be a list of strings")
+    if len(texts) > max_batch:
+        raise InvalidRequest(f"at most {max_batch} texts per batch")
+    return texts
+
+
+def parse_job_texts(data, max_batch):
+    if data.get("texts") is None:
+        return parse_texts({"texts": [data.get("text", "")]}, max_batch)
+    return parse_texts(data, max_batch)
+
+
+def validate_job(kind, payload, max_batch):
+    if kind not in JOB_KINDS:
+        raise InvalidRequest(f"kind must be one of: {', '.join(JOB_KINDS)}")
+    parse_digest_request(payload)
+    if kind == "digest":
+        parse_job_texts(payload, max_batch)
+    elif not isinstance(payload.get("text"), str) or not isinstance(payload.get("title", ""), str):
+        raise InvalidRequest("pdf jobs need a text string and an optional title string")
@@ -0,0 +1,21 @@
+"""Production WSGI entry point, served by gunicorn with the settings in gunicorn.conf.py.
+
+    WEB_CONCURRENCY=4 gunicorn
+
+With PRELOAD enabled (the default) the ML libraries and the memory-mapped
+corpus index are loaded here, once, before the server forks its workers, so the
+read-only pages are shared copy-on-write instead of being loaded per worker.
+Pools, threads and database connections are still created inside each worker,
+by gunicorn's post_worker_init hook or on first use.
+"""
+import gc
+
+from app import create_app
+
+app = create_app()
+
+if app.config["PRELOAD"]:
+    app.extensions["blog_digest"].warm_up(fork_safe=True)
+    # Move everything loaded so far out of the collector's reach: otherwise each
+    # worker's GC passes write to those objects and un-share their pages.
+    gc.freeze()